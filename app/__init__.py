@@ -2,6 +2,8 @@ from flask import Flask, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
 from flask_cors import CORS
 from flask_restx import Api
 import redis
@@ -9,6 +11,10 @@ import os
 import logging
 
 from app.config import Config
+from app.log import configure_logging
+from app.profiling import init_profiling
+
+logger = logging.getLogger(__name__)
 
 db = SQLAlchemy()
 migrate = Migrate()
@@ -39,7 +45,7 @@ redis_client = redis.Redis(
 )
 # Test the connection
 redis_client.ping()
-logging.info("Successfully connected to Redis")
+logger.info("Successfully connected to Redis")
 
 
 def create_app(config_class=Config):
@@ -53,11 +59,15 @@ def create_app(config_class=Config):
     app.config['JWT_HEADER_TYPE'] = 'Bearer'
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = 3600  # 1 hour
 
+    # After the JWT settings, so the key actually used to sign tokens is redacted
+    configure_logging(app)
+
     db.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
     CORS(app)
     api.init_app(app)
+    init_profiling(app)
 
     # Add JWT error handlers
     @jwt.unauthorized_loader
@@ -67,11 +77,32 @@ def create_app(config_class=Config):
         }), 401
 
     @jwt.expired_token_loader
-    def expired_token_callback(callback):
+    def expired_token_callback(jwt_header, jwt_payload):
         return jsonify({
             'msg': 'Token has expired'
         }), 401
 
+    from app.auth.revocation import revoked_tokens
+    revoked_tokens.start()
+
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        return revoked_tokens.is_revoked(jwt_payload['jti'])
+
+    @jwt.revoked_token_loader
+    def revoked_token_callback(jwt_header, jwt_payload):
+        return jsonify({
+            'msg': 'Token has been revoked'
+        }), 401
+
+    # flask-restx answers exceptions it has no handler for with a 500. When an
+    # Api error handler raises, it falls back to Flask's error handling, where
+    # JWTManager registered the handlers that call the loaders above
+    @api.errorhandler(JWTExtendedException)
+    @api.errorhandler(PyJWTError)
+    def jwt_error_callback(error):
+        raise error
+
     from app.auth import bp as auth_bp
     app.register_blueprint(auth_bp)
 
@@ -86,4 +117,10 @@ def create_app(config_class=Config):
         except redis.ConnectionError:
             return {'status': 'unhealthy', 'redis': 'disconnected'}
 
+    @app.route('/metrics')
+    def metrics():
+        from app.donations.payment import get_circuit_breaker
+        lines = get_circuit_breaker().metrics()
+        return '\n'.join(lines) + '\n', 200, {'Content-Type': 'text/plain; version=0.0.4'}
+
     return app 
\ No newline at end of file
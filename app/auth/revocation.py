@@ -0,0 +1,94 @@
+import logging
+import threading
+import time
+
+from app import redis_client
+from app.pubsub import listener
+
+logger = logging.getLogger(__name__)
+
+# Sorted set of revoked token ids scored by their expiry timestamp
+KEY = 'revoked_jtis'
+CHANNEL = 'auth:revoked'
+
+
+class RevokedTokens:
+    """
+    Revoked token ids, kept in one Redis sorted set scored by the token
+    expiry until the token would have expired anyway, and mirrored in
+    memory so checking a token costs no round trip.
+    Other workers learn about revocations through pub/sub and resync from
+    Redis whenever the subscription is re-established.
+    """
+
+    def __init__(self, client, reload_interval=5, prune_interval=60):
+        self.client = client
+        self.reload_interval = reload_interval
+        self.prune_interval = prune_interval
+        self._expiry = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._last_load_attempt = 0
+        self._last_prune = time.time()
+
+    def revoke(self, jti, exp):
+        """Revoke a token id until its expiry timestamp"""
+        now = time.time()
+        if exp <= now:
+            return
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zadd(KEY, {jti: int(exp)})
+        # Tokens past their expiry are rejected anyway
+        pipe.zremrangebyscore(KEY, '-inf', now)
+        pipe.publish(CHANNEL, f'{jti} {int(exp)}')
+        pipe.execute()
+        self._add(jti, exp)
+
+    def is_revoked(self, jti):
+        if not self._loaded:
+            self._load()
+        now = time.time()
+        if now - self._last_prune > self.prune_interval:
+            self._prune(now)
+        exp = self._expiry.get(jti)
+        return exp is not None and exp > now
+
+    def _add(self, jti, exp):
+        with self._lock:
+            self._expiry[jti] = float(exp)
+
+    def _on_message(self, channel, data):
+        jti, exp = data.rsplit(' ', 1)
+        self._add(jti, exp)
+
+    def _prune(self, now):
+        with self._lock:
+            self._expiry = {jti: exp for jti, exp in self._expiry.items() if exp > now}
+            self._last_prune = now
+
+    def _load(self):
+        now = time.time()
+        if now - self._last_load_attempt < self.reload_interval:
+            return
+        self._last_load_attempt = now
+        try:
+            expiry = dict(self.client.zrangebyscore(KEY, now, '+inf', withscores=True))
+            with self._lock:
+                self._expiry.update(expiry)
+            self._loaded = True
+            logger.info("Loaded %s revoked tokens", len(expiry))
+        except Exception as e:
+            # Retried on a later check; until then only pub/sub updates apply
+            logger.error("Error loading revoked tokens: %s", e)
+
+    def start(self):
+        """Subscribe to revocations from other workers"""
+        listener.on_reconnect(self._reload)
+        listener.subscribe(CHANNEL, self._on_message)
+
+    def _reload(self):
+        self._last_load_attempt = 0
+        self._load()
+
+
+revoked_tokens = RevokedTokens(redis_client)
@@ -1,5 +1,5 @@
 from flask import request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt
 from flask_restx import Resource, Namespace, fields
 import logging
 
@@ -7,6 +7,10 @@ from app import db, api
 from app.auth import bp
 from app.models.user import User
 from app.auth.utils import send_otp, verify_otp
+from app.auth.revocation import revoked_tokens
+from app.ratelimit import rate_limit
+
+logger = logging.getLogger(__name__)
 
 # Create namespace for auth
 ns = Namespace('auth', description='Authentication operations')
@@ -37,6 +41,8 @@ user_model = api.model('User', {
 @ns.route('/register')
 class Register(Resource):
     @ns.expect(register_model)
+    @ns.response(429, 'Too many requests')
+    @rate_limit('auth.register', scope='ip')
     def post(self):
         """Register a new user or request OTP for existing user"""
         data = request.json
@@ -85,7 +91,7 @@ class Verify(Resource):
             
             # Create access token with user_id as string
             access_token = create_access_token(identity=str(user.id))
-            logging.info(f"Created access token for user_id: {user.id}")
+            logger.info("Created access token for user_id: %s", user.id)
             
             return {
                 'message': 'Authentication successful',
@@ -95,6 +101,22 @@ class Verify(Resource):
         else:
             return {'error': result['error']}, 400
 
+@ns.route('/logout')
+class Logout(Resource):
+    @ns.doc(security='Bearer')
+    @ns.response(200, 'Logged out successfully')
+    @jwt_required()
+    def post(self):
+        """Revoke the current access token"""
+        try:
+            token = get_jwt()
+            revoked_tokens.revoke(token['jti'], token['exp'])
+            logger.info("Revoked token for user_id: %s", token['sub'])
+            return {'message': 'Logged out successfully'}, 200
+        except Exception as e:
+            logger.error("Error revoking token: %s", e)
+            return {'error': str(e)}, 500
+
 @ns.route('/profile')
 class Profile(Resource):
     @ns.doc(security='Bearer')
@@ -105,7 +127,7 @@ class Profile(Resource):
         """Get user profile"""
         try:
             user_id = get_jwt_identity()
-            logging.info(f"Getting profile for user_id: {user_id}")
+            logger.info("Getting profile for user_id: %s", user_id)
             user = User.query.get(int(user_id))
             
             if not user:
@@ -119,7 +141,7 @@ class Profile(Resource):
                 'created_at': user.created_at.isoformat()
             }, 200
         except Exception as e:
-            logging.error(f"Error getting profile: {str(e)}")
+            logger.error("Error getting profile: %s", e)
             return {'error': str(e)}, 500
 
     @ns.doc(security='Bearer')
@@ -131,7 +153,7 @@ class Profile(Resource):
         """Update user profile"""
         try:
             user_id = get_jwt_identity()
-            logging.info(f"Updating profile for user_id: {user_id}")
+            logger.info("Updating profile for user_id: %s", user_id)
             user = User.query.get(int(user_id))
             
             if not user:
@@ -156,7 +178,7 @@ class Profile(Resource):
                 }
             }, 200
         except Exception as e:
-            logging.error(f"Error updating profile: {str(e)}")
+            logger.error("Error updating profile: %s", e)
             db.session.rollback()
             return {'error': str(e)}, 500
 
@@ -26,9 +26,47 @@ class Config:
     RAZORPAY_CURRENCY = 'INR'
     RAZORPAY_PAYMENT_CAPTURE = 1  # Auto capture payment
     
+    # Razorpay load shedding: calls in flight per worker, and how long a
+    # request may wait for a free slot before getting a 503
+    RAZORPAY_MAX_CONCURRENCY = int(os.environ.get('RAZORPAY_MAX_CONCURRENCY', 20))
+    RAZORPAY_ACQUIRE_TIMEOUT = 0.5  # seconds
+    RAZORPAY_TIMEOUT = float(os.environ.get('RAZORPAY_TIMEOUT', 5))  # seconds per API call
+
+    # Razorpay circuit breaker: open after this many consecutive upstream
+    # failures, probe again after the reset timeout
+    RAZORPAY_BREAKER_FAILURES = int(os.environ.get('RAZORPAY_BREAKER_FAILURES', 5))
+    RAZORPAY_BREAKER_RESET_TIMEOUT = int(os.environ.get('RAZORPAY_BREAKER_RESET_TIMEOUT', 30))  # seconds
+
     # Razorpay Webhook Settings
     RAZORPAY_WEBHOOK_SECRET = os.environ.get('RAZORPAY_WEBHOOK_SECRET', 'your-webhook-secret')
     
+    # Purge job for soft deleted donations (flask donations purge-deleted)
+    PURGE_BATCH_SIZE = 500
+    PURGE_CONCURRENCY = 8  # payment links cancelled in parallel
+
+    # Rate limits per route, as "<requests>/<second|minute|hour|day>"
+    RATE_LIMITS = {
+        'auth.register': os.environ.get('RATE_LIMIT_REGISTER', '5/minute'),
+        'donations.create': os.environ.get('RATE_LIMIT_DONATION_CREATE', '30/minute'),
+        'donations.status': os.environ.get('RATE_LIMIT_DONATION_STATUS', '60/minute')
+    }
+
+    # Logging Config
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_QUEUE_SIZE = 10000  # records buffered before new ones are dropped
+    # Fraction of records below WARNING kept per logger (or logger prefix)
+    LOG_SAMPLE_RATES = {
+        'app.donations.payment.payloads': float(os.environ.get('LOG_PAYLOAD_SAMPLE_RATE', 0.01))
+    }
+
+    # Profiling Config: requests are profiled when sampled or when they carry
+    # a PROFILING_HEADER signed with PROFILING_SECRET (flask profile-token)
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+    PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+    PROFILING_SECRET = os.environ.get('PROFILING_SECRET')
+    PROFILING_HEADER = 'X-Profile-Token'
+    PROFILING_DIR = os.environ.get('PROFILING_DIR', '/tmp/profiles')
+
     # Payment Callback URLs
     PAYMENT_SUCCESS_URL = '/donation/success'
     PAYMENT_FAILURE_URL = '/donation/failure'
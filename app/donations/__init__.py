@@ -2,4 +2,4 @@ from flask import Blueprint
 
 bp = Blueprint('donations', __name__)
 
-from app.donations import routes 
\ No newline at end of file
+from app.donations import routes, commands
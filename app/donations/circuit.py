@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Numeric values for the state metric
+STATE_VALUES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing dependency for `reset_timeout` seconds after
+    `failure_threshold` consecutive failures, then lets a single probe
+    call through (half-open) to decide whether to close again.
+    State is kept per worker process.
+
+    allow() hands out the current generation, which changes on every
+    transition and every probe. Outcomes are reported with it, so a slow
+    call that started in an earlier state cannot close or reopen the breaker.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self.opened_total = 0
+        self.rejected_total = 0
+        self._probe_in_flight = False
+        self._probe_started = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Return the generation to report the call's outcome with, or None
+        if the call must not go through now
+        """
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._transition(HALF_OPEN)
+
+            if self.state == CLOSED:
+                return self._generation
+            if self.state == HALF_OPEN:
+                now = time.monotonic()
+                # A probe that never reported back no longer blocks the next one
+                if not self._probe_in_flight or now - self._probe_started >= self.reset_timeout:
+                    self._generation += 1
+                    self._probe_in_flight = True
+                    self._probe_started = now
+                    return self._generation
+
+            self.rejected_total += 1
+            return None
+
+    def _transition(self, state):
+        self.state = state
+        self._generation += 1
+        self._probe_in_flight = False
+
+    def retry_after(self):
+        """Seconds until the next probe is allowed"""
+        with self._lock:
+            if self.state != OPEN:
+                return 1
+            return max(1, int(self.reset_timeout - (time.monotonic() - self.opened_at)) + 1)
+
+    def record_success(self, generation):
+        with self._lock:
+            if generation != self._generation or self.state == OPEN:
+                return
+            self.failures = 0
+            if self.state == HALF_OPEN:
+                self._transition(CLOSED)
+
+    def release_probe(self, generation):
+        """Give up a call that ended without a verdict, e.g. interrupted by a timeout"""
+        with self._lock:
+            if generation == self._generation:
+                self._probe_in_flight = False
+
+    def record_failure(self, generation):
+        with self._lock:
+            if generation != self._generation or self.state == OPEN:
+                return
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_total += 1
+                self.opened_at = time.monotonic()
+                self._transition(OPEN)
+
+    def metrics(self):
+        """
+        Prometheus text exposition lines for this breaker. Each worker
+        process has its own breaker, so series are labelled with the pid.
+        """
+        labels = f'{{name="{self.name}",pid="{os.getpid()}"}}'
+        with self._lock:
+            return [
+                f'circuit_breaker_state{labels} {STATE_VALUES[self.state]}',
+                f'circuit_breaker_failures{labels} {self.failures}',
+                f'circuit_breaker_opened_total{labels} {self.opened_total}',
+                f'circuit_breaker_rejected_total{labels} {self.rejected_total}'
+            ]
@@ -0,0 +1,21 @@
+import click
+
+from app.donations import bp
+from app.donations import leaderboard, purge
+
+
+@bp.cli.command('rebuild-leaderboards')
+def rebuild_leaderboards():
+    """Rebuild the Redis leaderboards from completed donations in Postgres"""
+    counts = leaderboard.rebuild()
+    for (board, window), members in sorted(counts.items()):
+        click.echo(f"{board}:{window} -> {members} members")
+
+
+@bp.cli.command('purge-deleted')
+@click.option('--batch-size', type=int, default=None, help='Rows deleted per statement')
+@click.option('--concurrency', type=int, default=None, help='Payment links cancelled in parallel')
+def purge_deleted_donations(batch_size, concurrency):
+    """Cancel payment links of deleted donations and remove the rows"""
+    purged, kept = purge.purge_deleted(batch_size, concurrency)
+    click.echo(f"Purged {purged} donations, kept {kept} whose payment link could not be closed")
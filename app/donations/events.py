@@ -0,0 +1,187 @@
+import json
+import logging
+import queue
+import re
+import threading
+
+from app import redis_client
+from app.pubsub import listener
+from app.donations import leaderboard
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = 'donation_events:'
+
+# Number of events kept per creator for Last-Event-ID resume
+STREAM_MAXLEN = 1000
+
+# A creator's stream is dropped once it has had no new events for this
+# long, which bounds how late a Last-Event-ID resume can be
+STREAM_TTL = 24 * 3600 * 1000  # milliseconds
+
+# Events buffered per connected client before it is considered too slow
+SUBSCRIBER_QUEUE_SIZE = 100
+
+HEARTBEAT_INTERVAL = 15  # seconds
+SUBSCRIBE_TIMEOUT = 5  # seconds a new connection waits for the pub/sub subscription
+RETRY_INTERVAL = 3000  # milliseconds, sent to EventSource clients
+
+EVENT_ID_RE = re.compile(r'^\d+-\d+$')
+
+# Append to the resume log and publish in one round trip, so the event id
+# seen by live subscribers is always the one they can resume from
+_publish_script = redis_client.register_script("""
+local id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*', 'data', ARGV[2])
+redis.call('PEXPIRE', KEYS[1], ARGV[3])
+redis.call('PUBLISH', KEYS[1], id .. ' ' .. ARGV[2])
+return id
+""")
+
+
+def _channel(creator_id):
+    return f'{CHANNEL_PREFIX}{creator_id}'
+
+
+def _event_key(event_id):
+    millis, seq = event_id.split('-')
+    return int(millis), int(seq)
+
+
+def _format_event(event_id, data):
+    return f'id: {event_id}\nevent: status\ndata: {data}\n\n'
+
+
+def publish_status(donation, previous_status=None):
+    """Publish the current status of a donation to its creator's event stream"""
+    data = json.dumps({
+        'donation_id': donation.id,
+        'payment_link_id': donation.payment_link_id,
+        'status': donation.status,
+        'previous_status': previous_status,
+        'amount': donation.amount,
+        'payment_date': donation.payment_date.isoformat() if donation.payment_date else None
+    })
+    try:
+        _publish_script(keys=[_channel(donation.link_creator_id)], args=[STREAM_MAXLEN, data, STREAM_TTL])
+    except Exception as e:
+        # Clients can always fall back to the status endpoint
+        logger.error("Error publishing status for donation %s: %s", donation.id, e)
+
+
+def notify_status_change(donation, previous_status):
+    """
+    Single hook for every code path that changes Donation.status.
+    Call after the change has been committed.
+    """
+    if donation.status == previous_status:
+        return
+    # Deleted donations can still be paid before the purge cancels their
+    # link; they are recorded but do not count towards the leaderboards
+    if donation.status == 'payment_completed' and donation.deleted_at is None:
+        leaderboard.record_completion(donation)
+    publish_status(donation, previous_status)
+
+
+class _Subscriber:
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+
+class StatusStream:
+    """
+    Fans out status events from the shared pub/sub listener to the SSE
+    connections of this process. Idle connections only wait on a queue.
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._started = False
+
+    def _start(self):
+        pattern = f'{CHANNEL_PREFIX}*'
+        with self._lock:
+            start = not self._started
+            self._started = True
+        if start:
+            listener.psubscribe(pattern, self._dispatch)
+        # Until Redis confirms the pattern, events would reach no one
+        if not listener.wait_subscribed(pattern, SUBSCRIBE_TIMEOUT):
+            logger.warning("Donation event subscription not confirmed after %ss", SUBSCRIBE_TIMEOUT)
+
+    def _dispatch(self, channel, message):
+        creator_id = channel[len(CHANNEL_PREFIX):]
+        event_id, data = message.split(' ', 1)
+        with self._lock:
+            subscribers = list(self._subscribers.get(creator_id, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait((event_id, data))
+            except queue.Full:
+                # The client replays the gap from the stream once it catches up
+                subscriber.overflowed = True
+
+    def _register(self, creator_id):
+        subscriber = _Subscriber()
+        with self._lock:
+            self._subscribers.setdefault(creator_id, set()).add(subscriber)
+        return subscriber
+
+    def _unregister(self, creator_id, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(creator_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[creator_id]
+
+    def connection_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def _replay(self, creator_id, last_event_id):
+        entries = redis_client.xrange(_channel(creator_id), min=f'({last_event_id}', max='+')
+        return [(event_id, fields['data']) for event_id, fields in entries]
+
+    def events(self, creator_id, last_event_id=None):
+        """
+        Generate SSE frames for a creator, starting after last_event_id.
+        Subscribes before replaying so no event falls between the two.
+        """
+        self._start()
+        creator_id = str(creator_id)
+        if last_event_id and not EVENT_ID_RE.match(last_event_id):
+            last_event_id = None
+
+        subscriber = self._register(creator_id)
+        try:
+            yield f'retry: {RETRY_INTERVAL}\n\n'
+
+            pending = self._replay(creator_id, last_event_id) if last_event_id else []
+            while True:
+                for event_id, data in pending:
+                    if last_event_id and _event_key(event_id) <= _event_key(last_event_id):
+                        continue
+                    last_event_id = event_id
+                    yield _format_event(event_id, data)
+
+                if subscriber.overflowed:
+                    subscriber.overflowed = False
+                    if last_event_id:
+                        # Drop what was buffered and fetch the full gap from the stream
+                        while not subscriber.queue.empty():
+                            subscriber.queue.get_nowait()
+                        pending = self._replay(creator_id, last_event_id)
+                        continue
+
+                try:
+                    pending = [subscriber.queue.get(timeout=HEARTBEAT_INTERVAL)]
+                except queue.Empty:
+                    pending = []
+                    yield ': heartbeat\n\n'
+        finally:
+            self._unregister(creator_id, subscriber)
+
+
+status_stream = StatusStream()
@@ -0,0 +1,261 @@
+from datetime import datetime, timedelta
+import logging
+
+from sqlalchemy import func
+
+from app import db, redis_client
+from app.models.donation import Donation
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+BOARDS = ('creator', 'donor')
+WINDOWS = ('all', 'day', 'month')
+
+# Hash of normalised donor email -> donor name shown on the donor board
+DONOR_NAMES_KEY = 'leaderboard:donor:names'
+
+# Windowed boards only matter for a while after the window closes
+WINDOW_TTL = {
+    'day': 7 * 24 * 3600,
+    'month': 400 * 24 * 3600
+}
+
+
+def _period(window, when):
+    """Return the period suffix of a window for the given datetime"""
+    if window == 'day':
+        return when.strftime('%Y%m%d')
+    if window == 'month':
+        return when.strftime('%Y%m')
+    return None
+
+
+def leaderboard_key(board, window='all', period=None):
+    """
+    Build the Redis key of a leaderboard sorted set
+    e.g. leaderboard:creator:all, leaderboard:donor:day:20250422
+    """
+    if window == 'all':
+        return f'leaderboard:{board}:all'
+    return f'leaderboard:{board}:{window}:{period}'
+
+
+def _members(donation):
+    """Yield (board, member) pairs a completed donation counts towards"""
+    yield 'creator', str(donation.link_creator_id)
+    if donation.donor_email:
+        yield 'donor', donation.donor_email.strip().lower()
+
+
+def _apply(donation, sign):
+    when = donation.payment_date or datetime.utcnow()
+    pipe = redis_client.pipeline(transaction=False)
+    for board, member in _members(donation):
+        for window in WINDOWS:
+            key = leaderboard_key(board, window, _period(window, when))
+            # Scores are exact integer paise
+            pipe.zincrby(key, sign * donation.amount_paise, member)
+            if sign < 0:
+                # Members left with nothing completed drop off the board
+                pipe.zremrangebyscore(key, '-inf', 0)
+            if window in WINDOW_TTL:
+                pipe.expire(key, WINDOW_TTL[window])
+    if sign > 0 and donation.donor_email and donation.donor_name:
+        pipe.hset(DONOR_NAMES_KEY, donation.donor_email.strip().lower(), donation.donor_name)
+    pipe.execute()
+
+
+def record_completion(donation):
+    """
+    Add a donation that just transitioned to payment_completed to every
+    leaderboard it belongs to. Must be called once per transition.
+    """
+    try:
+        _apply(donation, 1)
+    except Exception as e:
+        # The boards can always be rebuilt from Postgres, never fail the request
+        logger.error("Error updating leaderboards for donation %s: %s", donation.id, e)
+
+
+def record_removal(donation):
+    """Take a deleted completed donation back out of its leaderboards"""
+    try:
+        _apply(donation, -1)
+    except Exception as e:
+        logger.error("Error updating leaderboards for donation %s: %s", donation.id, e)
+
+
+def top(board, window='all', period=None, limit=10):
+    """
+    Return the top `limit` members of a leaderboard as (member, total in
+    rupees) pairs. `period` defaults to the current day/month for windowed boards.
+    """
+    if window != 'all' and period is None:
+        period = _period(window, datetime.utcnow())
+    key = leaderboard_key(board, window, period)
+    entries = redis_client.zrevrange(key, 0, limit - 1, withscores=True)
+    return [(member, int(score) / 100) for member, score in entries]
+
+
+def mask_email(email):
+    """Mask a donor email for display, e.g. j***@example.com"""
+    local, _, domain = email.partition('@')
+    return f'{local[:1]}***@{domain}' if domain else f'{local[:1]}***'
+
+
+def creator_names(members):
+    """Map creator board members to user names"""
+    if not members:
+        return {}
+    users = User.query.filter(User.id.in_([int(member) for member in members])).all()
+    return {str(user.id): user.name for user in users}
+
+
+def donor_names(members):
+    """Map donor board members (normalised emails) to the donor name they last used"""
+    if not members:
+        return {}
+    return dict(zip(members, redis_client.hmget(DONOR_NAMES_KEY, members)))
+
+
+def _next_month(month_start):
+    if month_start.month == 12:
+        return month_start.replace(year=month_start.year + 1, month=1)
+    return month_start.replace(month=month_start.month + 1)
+
+
+def _previous_month(month_start):
+    if month_start.month == 1:
+        return month_start.replace(year=month_start.year - 1, month=12)
+    return month_start.replace(month=month_start.month - 1)
+
+
+def _live_periods(window, now):
+    """
+    Return the (start, end) ranges of every period of a window whose board
+    may still exist in Redis, oldest first. Boards expire WINDOW_TTL after
+    their last update, and the last update of a period is at the latest
+    around its end.
+    """
+    ttl = timedelta(seconds=WINDOW_TTL[window])
+    day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    periods = []
+    if window == 'day':
+        start = day_start
+        while start + timedelta(days=1) + ttl > now:
+            periods.append((start, start + timedelta(days=1)))
+            start -= timedelta(days=1)
+    else:
+        start = day_start.replace(day=1)
+        while _next_month(start) + ttl > now:
+            periods.append((start, _next_month(start)))
+            start = _previous_month(start)
+    return periods[::-1]
+
+
+def _scores(board, column, window=None, since=None):
+    """
+    Sum completed donations in paise per member, grouped by the start of
+    their period for windowed boards: {period start: {member: total}}
+    """
+    columns = [column]
+    if window is not None:
+        columns.insert(0, func.date_trunc(window, Donation.payment_date))
+    query = db.session.query(*columns, func.sum(Donation.amount_paise)).filter(
+        Donation.status == 'payment_completed',
+        Donation.deleted_at.is_(None),
+        column.isnot(None)
+    )
+    if since is not None:
+        query = query.filter(Donation.payment_date >= since)
+
+    scores = {}
+    for row in query.group_by(*columns):
+        start, member, total = row if window is not None else (None, *row)
+        if board == 'donor':
+            member = member.strip().lower()
+            if not member:
+                continue
+        member = str(member)
+        period_scores = scores.setdefault(start, {})
+        period_scores[member] = period_scores.get(member, 0) + int(total)
+    return scores
+
+
+def _replace_board(key, scores, ttl=None):
+    tmp_key = f'{key}:rebuild'
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.delete(tmp_key)
+    if scores:
+        pipe.zadd(tmp_key, scores)
+        if ttl is not None:
+            pipe.expire(tmp_key, ttl)
+        # Swap atomically so readers never see a half-built board
+        pipe.rename(tmp_key, key)
+    else:
+        pipe.delete(key)
+    pipe.execute()
+
+
+def _rebuild_donor_names():
+    names = {}
+    rows = db.session.query(Donation.donor_email, Donation.donor_name).filter(
+        Donation.status == 'payment_completed',
+        Donation.deleted_at.is_(None),
+        Donation.donor_email.isnot(None),
+        Donation.donor_name.isnot(None)
+    ).order_by(Donation.payment_date)
+    for email, name in rows:
+        email = email.strip().lower()
+        if email:
+            # Latest completed donation wins, as with incremental updates
+            names[email] = name
+    _replace_hash(DONOR_NAMES_KEY, names)
+    return len(names)
+
+
+def _replace_hash(key, mapping):
+    tmp_key = f'{key}:rebuild'
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.delete(tmp_key)
+    if mapping:
+        pipe.hset(tmp_key, mapping=mapping)
+        pipe.rename(tmp_key, key)
+    else:
+        pipe.delete(key)
+    pipe.execute()
+
+
+def rebuild(now=None):
+    """
+    Reconstruct the overall leaderboards and every day and month board
+    still within its TTL from completed donations in Postgres. Returns the
+    number of members written per (board, window).
+    """
+    now = now or datetime.utcnow()
+    columns = {
+        'creator': Donation.link_creator_id,
+        'donor': Donation.donor_email
+    }
+
+    counts = {}
+    for board in BOARDS:
+        column = columns[board]
+        scores = _scores(board, column).get(None, {})
+        _replace_board(leaderboard_key(board), scores)
+        counts[(board, 'all')] = len(scores)
+
+        for window in WINDOW_TTL:
+            periods = _live_periods(window, now)
+            by_period = _scores(board, column, window, since=periods[0][0])
+            counts[(board, window)] = 0
+            for start, end in periods:
+                scores = by_period.get(start, {})
+                # Expire as if the board had last been updated at the end of its period
+                ttl = max(1, int((end - now).total_seconds()) + WINDOW_TTL[window])
+                _replace_board(leaderboard_key(board, window, _period(window, start)), scores, ttl)
+                counts[(board, window)] += len(scores)
+
+    counts[('donor', 'names')] = _rebuild_donor_names()
+    return counts
@@ -3,7 +3,96 @@ import hmac
 import hashlib
 from flask import current_app
 import logging
+import threading
 from datetime import datetime, timedelta
+import requests
+
+from app.profiling import timed
+from app.donations.circuit import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+# Full Razorpay responses, sampled via LOG_SAMPLE_RATES
+payload_logger = logging.getLogger(f'{__name__}.payloads')
+
+class PaymentGatewayUnavailable(Exception):
+    """Razorpay is not being called right now, retry after `retry_after` seconds"""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class PaymentGatewayBusy(PaymentGatewayUnavailable):
+    """Too many Razorpay calls are already in flight from this worker"""
+
+class PaymentGatewayCircuitOpen(PaymentGatewayUnavailable):
+    """Razorpay has been failing and is not called until the breaker probes it again"""
+
+# Errors that mean Razorpay itself is unhealthy, as opposed to a bad request
+UPSTREAM_ERRORS = (
+    razorpay.errors.ServerError,
+    razorpay.errors.GatewayError,
+    requests.exceptions.RequestException
+)
+
+_call_slots = None
+_breaker = None
+_init_lock = threading.Lock()
+
+def _get_call_slots():
+    global _call_slots
+    if _call_slots is None:
+        with _init_lock:
+            if _call_slots is None:
+                _call_slots = threading.BoundedSemaphore(current_app.config['RAZORPAY_MAX_CONCURRENCY'])
+    return _call_slots
+
+def get_circuit_breaker():
+    """The per-worker circuit breaker guarding every Razorpay call"""
+    global _breaker
+    if _breaker is None:
+        with _init_lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker(
+                    'razorpay',
+                    failure_threshold=current_app.config['RAZORPAY_BREAKER_FAILURES'],
+                    reset_timeout=current_app.config['RAZORPAY_BREAKER_RESET_TIMEOUT']
+                )
+    return _breaker
+
+def razorpay_call(method, *args, **kwargs):
+    """
+    Call a Razorpay client method, shedding load instead of queueing
+    when RAZORPAY_MAX_CONCURRENCY calls are already waiting on Razorpay,
+    and failing fast while the circuit breaker is open
+    """
+    slots = _get_call_slots()
+    if not slots.acquire(timeout=current_app.config['RAZORPAY_ACQUIRE_TIMEOUT']):
+        raise PaymentGatewayBusy('Too many payment gateway calls in flight')
+    try:
+        breaker = get_circuit_breaker()
+        generation = breaker.allow()
+        if generation is None:
+            raise PaymentGatewayCircuitOpen('Payment gateway circuit is open', breaker.retry_after())
+
+        kwargs.setdefault('timeout', current_app.config['RAZORPAY_TIMEOUT'])
+        try:
+            with timed('razorpay'):
+                result = method(*args, **kwargs)
+        except UPSTREAM_ERRORS:
+            breaker.record_failure(generation)
+            raise
+        except Exception:
+            # Client errors (bad request, not found) say nothing about upstream health
+            breaker.record_success(generation)
+            raise
+        except BaseException:
+            # Interrupted (gevent Timeout, GreenletExit): free the half-open probe
+            breaker.release_probe(generation)
+            raise
+        breaker.record_success(generation)
+        return result
+    finally:
+        slots.release()
 
 def create_razorpay_client():
     """Create and return a Razorpay client instance"""
@@ -24,13 +113,20 @@ def create_order(amount, currency='INR'):
             'currency': currency,
             'payment_capture': 1  # Auto capture payment
         }
-        order = client.order.create(data=data)
-        logging.info(f"Created Razorpay order: {order}")
+        order = razorpay_call(client.order.create, data=data)
+        payload_logger.info("Created Razorpay order: %s", order)
         return order
     except Exception as e:
-        logging.error(f"Error creating Razorpay order: {str(e)}")
+        logger.error("Error creating Razorpay order: %s", e)
         raise
 
+def fetch_payment(payment_id):
+    """Fetch a single Razorpay payment"""
+    client = create_razorpay_client()
+    payment = razorpay_call(client.payment.fetch, payment_id)
+    payload_logger.info("Payment details: %s", payment)
+    return payment
+
 def fetch_payment_details(payment_link_id):
     """
     Fetch payment details from Razorpay
@@ -39,15 +135,15 @@ def fetch_payment_details(payment_link_id):
     client = create_razorpay_client()
     try:
         # First try to fetch payment link details
-        payment_link = client.payment_link.fetch(payment_link_id)
-        logging.info(f"Payment link details: {payment_link}")
+        payment_link = razorpay_call(client.payment_link.fetch, payment_link_id)
+        payload_logger.info("Payment link details: %s", payment_link)
 
         # If payment is completed, fetch the payment details
         if payment_link.get('status') == 'paid':
             payment_id = payment_link.get('payments', [{}])[0].get('id')
             if payment_id:
-                payment = client.payment.fetch(payment_id)
-                logging.info(f"Payment details: {payment}")
+                payment = razorpay_call(client.payment.fetch, payment_id)
+                payload_logger.info("Payment details: %s", payment)
                 return {
                     'status': 'paid',
                     'payment': payment,
@@ -69,20 +165,39 @@ def fetch_payment_details(payment_link_id):
             'order_id': payment_link.get('reference_id')
         }
 
+    except PaymentGatewayUnavailable:
+        raise
     except Exception as e:
-        logging.error(f"Error fetching payment details: {str(e)}")
+        logger.error("Error fetching payment details: %s", e)
         return {
             'status': 'error',
             'error': str(e)
         }
 
-def create_payment_link(amount, name, email, description="Donation via Localhost"):
+def verify_payment_link_signature(payment_link_id, reference_id, status, payment_id, signature):
+    """
+    Verify the signature Razorpay adds to the payment link callback URL,
+    HMAC-SHA256 of "<link id>|<reference id>|<status>|<payment id>" keyed
+    with the API key secret. Purely local, no API call.
+    """
+    if not signature:
+        return False
+    payload = f"{payment_link_id}|{reference_id}|{status}|{payment_id}"
+    expected = hmac.new(
+        current_app.config['RAZORPAY_KEY_SECRET'].encode(),
+        payload.encode(),
+        hashlib.sha256
+    ).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+def create_payment_link(amount_paise, name, email, description="Donation via Localhost"):
     """
     Create a Razorpay payment link
+    amount_paise: Amount in paise
     """
     client = create_razorpay_client()
     data = {
-        "amount": int(amount * 100),  # Convert to paise
+        "amount": int(amount_paise),
         "currency": "INR",
         "customer": {
             "name": name,
@@ -103,6 +218,22 @@ def create_payment_link(amount, name, email, description="Donation via Localhost
         },
         "reference_id": f"don_{int(datetime.now().timestamp())}"
     }
-    payment_link = client.payment_link.create(data=data)
-    logging.info(f"Created payment link: {payment_link}")
-    return payment_link 
\ No newline at end of file
+    payment_link = razorpay_call(client.payment_link.create, data=data)
+    payload_logger.info("Created payment link: %s", payment_link)
+    return payment_link 
+
+def fetch_payment_link(payment_link_id):
+    """
+    Fetch a Razorpay payment link
+    """
+    client = create_razorpay_client()
+    return razorpay_call(client.payment_link.fetch, payment_link_id)
+
+def cancel_payment_link(payment_link_id):
+    """
+    Cancel an unpaid Razorpay payment link
+    """
+    client = create_razorpay_client()
+    payment_link = razorpay_call(client.payment_link.cancel, payment_link_id)
+    logger.info("Cancelled payment link %s", payment_link_id)
+    return payment_link
@@ -0,0 +1,92 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from app import db
+from app.models.donation import Donation
+from app.donations.payment import cancel_payment_link, fetch_payment_link
+
+logger = logging.getLogger(__name__)
+
+# Payment link states in which the link can no longer take money
+CLOSED_LINK_STATUSES = ('cancelled', 'expired')
+
+
+def _close_payment_link(app, payment_link_id):
+    """
+    Make sure a payment link can no longer be paid.
+    Returns True when the donation row can be removed.
+    """
+    with app.app_context():
+        try:
+            cancel_payment_link(payment_link_id)
+            return True
+        except Exception as e:
+            cancel_error = e
+
+        # Cancelling fails for links that are already closed or paid
+        try:
+            status = fetch_payment_link(payment_link_id).get('status')
+        except Exception as e:
+            logger.warning("Could not cancel payment link %s: %s (%s)", payment_link_id, cancel_error, e)
+            return False
+
+        if status in CLOSED_LINK_STATUSES:
+            return True
+        if status == 'paid':
+            logger.warning("Payment link %s of a deleted donation was paid, keeping the row", payment_link_id)
+        else:
+            logger.warning("Could not cancel payment link %s: %s", payment_link_id, cancel_error)
+        return False
+
+
+def purge_deleted(batch_size=None, concurrency=None):
+    """
+    Cancel the payment links of soft deleted donations and hard delete the
+    rows, one batch at a time. Links are cancelled concurrently outside of
+    any transaction; each batch is then removed with a single DELETE.
+    Rows whose link could not be closed are kept for the next run.
+    """
+    app = current_app._get_current_object()
+    batch_size = batch_size or app.config['PURGE_BATCH_SIZE']
+    concurrency = concurrency or app.config['PURGE_CONCURRENCY']
+
+    purged = kept = 0
+    last_id = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while True:
+            batch = db.session.query(
+                Donation.id, Donation.status, Donation.payment_link_id
+            ).filter(
+                Donation.deleted_at.isnot(None),
+                Donation.id > last_id
+            ).order_by(Donation.id).limit(batch_size).all()
+            # Do not hold a transaction open while waiting on Razorpay
+            db.session.rollback()
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            # Older rows were marked payment_failed on transient errors while
+            # their link stayed payable, so only completed ones are skipped
+            to_cancel = [
+                row for row in batch
+                if row.payment_link_id and row.status != 'payment_completed'
+            ]
+            closed = executor.map(lambda row: _close_payment_link(app, row.payment_link_id), to_cancel)
+            failed = {row.id for row, ok in zip(to_cancel, closed) if not ok}
+
+            ids = [row.id for row in batch if row.id not in failed]
+            if ids:
+                Donation.query.filter(
+                    Donation.id.in_(ids),
+                    Donation.deleted_at.isnot(None)
+                ).delete(synchronize_session=False)
+                db.session.commit()
+
+            purged += len(ids)
+            kept += len(failed)
+            logger.info("Purged %s deleted donations up to id %s, kept %s", len(ids), last_id, len(failed))
+
+    return purged, kept
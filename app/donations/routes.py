@@ -1,13 +1,32 @@
-from flask import request, jsonify
+from flask import request, jsonify, Response
 from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
 from flask_restx import Resource, Namespace, fields
 import logging
 from datetime import datetime
 
 from app import db, api
-from app.models.donation import Donation
+from app.models.donation import Donation, to_paise
 from app.models.user import User
-from app.donations.payment import create_payment_link, fetch_payment_details
+from app.donations.payment import (
+    create_payment_link, fetch_payment, fetch_payment_details, verify_payment_link_signature,
+    PaymentGatewayUnavailable
+)
+from app.donations import leaderboard
+from app.donations.events import notify_status_change, status_stream
+from app.ratelimit import rate_limit
+
+logger = logging.getLogger(__name__)
+
+
+def _payment_date(created_at):
+    """
+    Completion time of a donation from the Razorpay payment's created_at,
+    in UTC like every other timestamp, whichever path completes it
+    """
+    if not created_at:
+        return datetime.utcnow()
+    return datetime.utcfromtimestamp(created_at)
+
 
 # Create namespace for donations
 ns = Namespace('donations', description='Donation operations')
@@ -45,8 +64,8 @@ class DonationList(Resource):
         """Get all donations created by the current user"""
         try:
             user_id = get_jwt_identity()
-            logging.info(f"Getting donations for user_id: {user_id}")
-            donations = Donation.query.filter_by(link_creator_id=user_id).all()
+            logger.info("Getting donations for user_id: %s", user_id)
+            donations = Donation.active().filter_by(link_creator_id=user_id).all()
             
             return [{
                 'id': donation.id,
@@ -64,14 +83,17 @@ class DonationList(Resource):
                 'reference_id': donation.reference_id
             } for donation in donations], 200
         except Exception as e:
-            logging.error(f"Error getting donations: {str(e)}")
+            logger.error("Error getting donations: %s", e)
             return {'error': str(e)}, 500
 
     @ns.doc(security='Bearer')
     @ns.expect(create_donation_link_model)
     @ns.response(201, 'Donation link created successfully')
     @ns.response(400, 'Invalid input')
+    @ns.response(429, 'Too many requests')
+    @ns.response(503, 'Payment gateway unavailable')
     @jwt_required()
+    @rate_limit('donations.create')
     def post(self):
         """Create a new donation link"""
         try:
@@ -81,7 +103,10 @@ class DonationList(Resource):
             donor_name = data.get('donor_name','')
             donor_email = data.get('donor_email','')
             # Validate amount
-            if not isinstance(amount, (int, float)) or amount <= 0:
+            if not isinstance(amount, (int, float)) or isinstance(amount, bool) or amount <= 0:
+                return {'message': 'Invalid amount. Amount must be a positive number'}, 400
+            amount_paise = to_paise(amount)
+            if amount_paise <= 0:
                 return {'message': 'Invalid amount. Amount must be a positive number'}, 400
 
             # Get current user
@@ -92,7 +117,7 @@ class DonationList(Resource):
 
             # Create payment link
             payment_link = create_payment_link(
-                amount=amount,
+                amount_paise=amount_paise,
                 name=user.name,
                 email=user.email,
                 description=description
@@ -101,7 +126,7 @@ class DonationList(Resource):
             # Create donation record
             donation = Donation(
                 link_creator_id=user_id,
-                amount=amount,
+                amount_paise=amount_paise,
                 description=description,
                 status='link_created',
                 payment_link_id=payment_link['id'],
@@ -116,8 +141,10 @@ class DonationList(Resource):
             db.session.add(donation)
             db.session.commit()
 
+            notify_status_change(donation, None)
+
             # Log successful creation
-            logging.info(f"Created donation link with ID {donation.id} and payment link {payment_link['id']}")
+            logger.info("Created donation link with ID %s and payment link %s", donation.id, payment_link['id'])
 
             return {
                 'message': 'Donation link created successfully',
@@ -141,8 +168,12 @@ class DonationList(Resource):
                 }
             }, 201
 
+        except PaymentGatewayUnavailable as e:
+            logger.warning("Shedding donation link creation: %s", e)
+            db.session.rollback()
+            return {'message': 'Payment gateway unavailable, please retry later'}, 503, {'Retry-After': str(e.retry_after)}
         except Exception as e:
-            logging.error(f"Error creating donation link: {str(e)}")
+            logger.error("Error creating donation link: %s", e)
             db.session.rollback()
             return {'message': 'Error creating donation link', 'error': str(e)}, 500
 
@@ -156,8 +187,8 @@ class DonationResource(Resource):
         """Get a specific donation"""
         try:
             user_id = get_jwt_identity()
-            logging.info(f"Getting donation {donation_id} for user_id: {user_id}")
-            donation = Donation.query.filter_by(id=donation_id, link_creator_id=user_id).first()
+            logger.info("Getting donation %s for user_id: %s", donation_id, user_id)
+            donation = Donation.active().filter_by(id=donation_id, link_creator_id=user_id).first()
             
             if not donation:
                 return {'error': 'Donation not found'}, 404
@@ -178,7 +209,7 @@ class DonationResource(Resource):
                 'reference_id': donation.reference_id
             }, 200
         except Exception as e:
-            logging.error(f"Error getting donation: {str(e)}")
+            logger.error("Error getting donation: %s", e)
             return {'error': str(e)}, 500
 
     @ns.doc(security='Bearer')
@@ -189,18 +220,25 @@ class DonationResource(Resource):
         """Delete a donation"""
         try:
             user_id = get_jwt_identity()
-            logging.info(f"Deleting donation {donation_id} for user_id: {user_id}")
-            donation = Donation.query.filter_by(id=donation_id, link_creator_id=user_id).first()
+            logger.info("Deleting donation %s for user_id: %s", donation_id, user_id)
+            donation = Donation.active().filter_by(id=donation_id, link_creator_id=user_id).first()
             
             if not donation:
                 return {'error': 'Donation not found'}, 404
             
-            db.session.delete(donation)
+            # Soft delete, the payment link is cancelled and the row removed
+            # in batches by the purge job
+            deleted = Donation.active().filter_by(id=donation.id).update(
+                {'deleted_at': datetime.utcnow()}, synchronize_session=False
+            )
             db.session.commit()
+
+            if deleted and donation.status == 'payment_completed':
+                leaderboard.record_removal(donation)
             
             return {'message': 'Donation deleted successfully'}, 200
         except Exception as e:
-            logging.error(f"Error deleting donation: {str(e)}")
+            logger.error("Error deleting donation: %s", e)
             db.session.rollback()
             return {'error': str(e)}, 500
 
@@ -209,12 +247,14 @@ class DonationStatus(Resource):
     @ns.doc(security='Bearer')
     @ns.response(200, 'Success')
     @ns.response(404, 'Donation not found')
+    @ns.response(429, 'Too many requests')
     @jwt_required()
+    @rate_limit('donations.status')
     def get(self, payment_link_id):
         """Get donation status by payment link ID"""
         try:
             # First find the donation
-            donation = Donation.query.filter_by(
+            donation = Donation.active().filter_by(
                 payment_link_id=payment_link_id,
                 link_creator_id=get_jwt_identity()
             ).first()
@@ -222,22 +262,47 @@ class DonationStatus(Resource):
             if not donation:
                 return {'message': 'Donation not found'}, 404
 
-            # Fetch payment details from Razorpay
-            payment_details = fetch_payment_details(payment_link_id)
-            logging.info(f"Payment details from Razorpay: {payment_details}")
+            # Fetch payment details from Razorpay, unless it is known to be down
+            try:
+                payment_details = fetch_payment_details(payment_link_id)
+            except PaymentGatewayUnavailable as e:
+                logger.warning("Serving stale status for %s: %s", payment_link_id, e)
+                payment_details = {'status': 'error', 'error': str(e)}
+            razorpay_status = payment_details.get('status')
+            logger.info("Razorpay status for %s: %s", payment_link_id, razorpay_status)
+
+            # An upstream error says nothing about the payment, keep serving
+            # the last known status instead of marking it failed
+            stale = razorpay_status == 'error'
 
             # Update donation status based on Razorpay response
-            if payment_details.get('status') == 'paid':
-                donation.status = 'payment_completed'
-                donation.payment_date = datetime.fromtimestamp(payment_details.get('created_at', 0))
-                donation.razorpay_payment_id = payment_details.get('id')
-            elif payment_details.get('status') == 'created':
-                donation.status = 'link_created'
-            else:
-                donation.status = 'payment_failed'
+            previous_status = donation.status
+            new_status = previous_status
+            if razorpay_status == 'paid':
+                new_status = 'payment_completed'
+            elif razorpay_status in ('created', 'partially_paid'):
+                new_status = 'link_created'
+            elif razorpay_status in ('cancelled', 'expired'):
+                new_status = 'payment_failed'
 
-            # Save changes to database
-            db.session.commit()
+            # Most polls observe no change, those skip the write entirely.
+            # Every remaining transition enters or leaves a completed/failed
+            # status, so none of them is safe to defer or batch.
+            if new_status != previous_status:
+                changes = {'status': new_status}
+                if new_status == 'payment_completed':
+                    changes['payment_date'] = _payment_date(payment_details.get('created_at'))
+                    changes['razorpay_payment_id'] = payment_details.get('id')
+                # Conditional on the status we read, so a concurrent poll or
+                # callback cannot apply the same transition twice
+                updated = Donation.query.filter(
+                    Donation.id == donation.id,
+                    Donation.status == previous_status
+                ).update(changes, synchronize_session=False)
+                db.session.commit()
+                db.session.refresh(donation)
+                if updated:
+                    notify_status_change(donation, previous_status)
 
             return {
                 'donation_id': donation.id,
@@ -249,14 +314,162 @@ class DonationStatus(Resource):
                 'donor_email': donation.donor_email,
                 'payment_date': donation.payment_date.isoformat() if donation.payment_date else None,
                 'payment_link_url': donation.payment_link_url,
-                'razorpay_status': payment_details.get('status'),
-                'razorpay_payment_id': payment_details.get('id')
+                'razorpay_status': None if stale else razorpay_status,
+                'razorpay_payment_id': payment_details.get('id'),
+                'stale': stale
             }, 200
 
         except Exception as e:
-            logging.error(f"Error fetching donation status: {str(e)}")
+            logger.error("Error fetching donation status: %s", e)
             return {'message': 'Error fetching donation status', 'error': str(e)}, 500
 
+@ns.route('/callback')
+class PaymentCallback(Resource):
+    @ns.doc(security=None, params={
+        'razorpay_payment_id': 'Razorpay payment ID',
+        'razorpay_payment_link_id': 'Razorpay payment link ID',
+        'razorpay_payment_link_reference_id': 'Payment link reference ID',
+        'razorpay_payment_link_status': 'Payment link status',
+        'razorpay_signature': 'Signature of the parameters above'
+    })
+    @ns.response(200, 'Success')
+    @ns.response(400, 'Invalid signature')
+    @ns.response(404, 'Donation not found')
+    def get(self):
+        """Razorpay redirects the donor here after paying through a payment link"""
+        try:
+            payment_id = request.args.get('razorpay_payment_id', '')
+            payment_link_id = request.args.get('razorpay_payment_link_id', '')
+            reference_id = request.args.get('razorpay_payment_link_reference_id', '')
+            link_status = request.args.get('razorpay_payment_link_status', '')
+            signature = request.args.get('razorpay_signature', '')
+
+            if not payment_link_id or not verify_payment_link_signature(
+                payment_link_id, reference_id, link_status, payment_id, signature
+            ):
+                logger.warning("Invalid payment callback signature for payment link %s", payment_link_id)
+                return {'message': 'Invalid payment signature'}, 400
+
+            # Deleted donations included: until the purge cancels the link it
+            # can still be paid, and that payment must be recorded
+            donation = Donation.query.filter_by(payment_link_id=payment_link_id).first()
+            if not donation:
+                return {'message': 'Donation not found'}, 404
+
+            if link_status == 'paid' and donation.status != 'payment_completed':
+                previous_status = donation.status
+                try:
+                    created_at = fetch_payment(payment_id).get('created_at') if payment_id else None
+                except Exception as e:
+                    # Never lose a verified payment because Razorpay is slow
+                    logger.warning("Could not fetch payment %s, using the callback time: %s", payment_id, e)
+                    created_at = None
+                # Conditional update, so a concurrent status refresh or a
+                # reloaded callback page cannot complete the donation twice
+                completed = Donation.query.filter(
+                    Donation.id == donation.id,
+                    Donation.status != 'payment_completed'
+                ).update({
+                    'status': 'payment_completed',
+                    'payment_date': _payment_date(created_at),
+                    'razorpay_payment_id': payment_id
+                }, synchronize_session=False)
+                db.session.commit()
+
+                if completed:
+                    db.session.refresh(donation)
+                    notify_status_change(donation, previous_status)
+                    logger.info("Donation %s completed via callback, payment %s", donation.id, payment_id)
+
+            return {
+                'message': 'Thank you for your donation' if link_status == 'paid' else 'Payment not completed',
+                'donation_id': donation.id,
+                'status': donation.status,
+                'razorpay_payment_id': payment_id or None
+            }, 200
+
+        except Exception as e:
+            logger.error("Error handling payment callback: %s", e)
+            db.session.rollback()
+            return {'message': 'Error handling payment callback', 'error': str(e)}, 500
+
+@ns.route('/leaderboard')
+class Leaderboard(Resource):
+    @ns.doc(security='Bearer', params={
+        'board': 'creator or donor (default: creator)',
+        'window': 'all, day or month (default: all)',
+        'period': 'YYYYMMDD for day or YYYYMM for month windows (default: current)',
+        'limit': 'Number of entries to return, 1-100 (default: 10)'
+    })
+    @ns.response(200, 'Success')
+    @ns.response(400, 'Invalid input')
+    @jwt_required()
+    def get(self):
+        """Get the top creators or donors by completed donation amount"""
+        try:
+            board = request.args.get('board', 'creator')
+            window = request.args.get('window', 'all')
+            period = request.args.get('period')
+            limit = request.args.get('limit', 10, type=int)
+
+            if board not in leaderboard.BOARDS:
+                return {'message': f"Invalid board. Must be one of {', '.join(leaderboard.BOARDS)}"}, 400
+            if window not in leaderboard.WINDOWS:
+                return {'message': f"Invalid window. Must be one of {', '.join(leaderboard.WINDOWS)}"}, 400
+            if not limit or not 1 <= limit <= 100:
+                return {'message': 'Invalid limit. Must be between 1 and 100'}, 400
+
+            entries = leaderboard.top(board, window, period, limit)
+
+            members = [member for member, _ in entries]
+            if board == 'creator':
+                names = leaderboard.creator_names(members)
+            else:
+                names = leaderboard.donor_names(members)
+
+            leaders = []
+            for rank, (member, total) in enumerate(entries, start=1):
+                # Donor emails stay internal to the sorted set, only a masked form is returned
+                identifier = member if board == 'creator' else leaderboard.mask_email(member)
+                leaders.append({
+                    'rank': rank,
+                    board: identifier,
+                    'name': names.get(member),
+                    'total_amount': total
+                })
+
+            return {
+                'board': board,
+                'window': window,
+                'period': period,
+                'leaders': leaders
+            }, 200
+        except Exception as e:
+            logger.error("Error getting leaderboard: %s", e)
+            return {'error': str(e)}, 500
+
+@ns.route('/events')
+class DonationEvents(Resource):
+    @ns.doc(security='Bearer', params={
+        'jwt': 'Access token, for EventSource clients that cannot set headers'
+    })
+    @ns.response(200, 'text/event-stream of status changes')
+    @jwt_required(locations=['headers', 'query_string'])
+    def get(self):
+        """Stream status changes of the current user's donations as Server-Sent Events"""
+        user_id = get_jwt_identity()
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        logger.info("Opening event stream for user_id: %s", user_id)
+
+        return Response(
+            status_stream.events(user_id, last_event_id),
+            mimetype='text/event-stream',
+            headers={
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no'
+            }
+        )
+
 
 # Register the namespace with the blueprint
 api.add_namespace(ns) 
\ No newline at end of file
@@ -0,0 +1,202 @@
+import atexit
+import importlib
+import json
+import logging
+import random
+import re
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+REDACTED = '[REDACTED]'
+
+# Dict keys whose values never reach the log output
+SENSITIVE_KEYS = {
+    'otp', 'password', 'secret', 'token', 'access_token', 'refresh_token',
+    'authorization', 'jwt', 'signature', 'razorpay_signature', 'key_secret'
+}
+
+# Patterns scrubbed from the final message text
+SENSITIVE_PATTERNS = [
+    (re.compile(r'(Bearer\s+)[\w\-.]+', re.IGNORECASE), r'\1' + REDACTED),
+    (re.compile(r'eyJ[\w-]+\.[\w-]+\.[\w-]+'), REDACTED),
+    (re.compile(r'(\botp\b\W{0,3}\s*)\d{4,8}', re.IGNORECASE), r'\1' + REDACTED),
+]
+
+# Attributes every LogRecord has; anything else was passed via `extra`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+def _redact(value, depth=0):
+    if depth > 5:
+        return value
+    if isinstance(value, dict):
+        return {
+            k: REDACTED if str(k).lower() in SENSITIVE_KEYS else _redact(v, depth + 1)
+            for k, v in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return type(value)(_redact(v, depth + 1) for v in value)
+    return value
+
+
+class RedactingJSONFormatter(logging.Formatter):
+    """
+    Render records as one JSON object per line with secrets removed.
+    Runs on the listener thread, so this cost is off the request path.
+    """
+
+    def __init__(self, secrets=()):
+        super().__init__()
+        self.secrets = [s for s in secrets if s]
+
+    def _scrub(self, text):
+        for pattern, replacement in SENSITIVE_PATTERNS:
+            text = pattern.sub(replacement, text)
+        for secret in self.secrets:
+            text = text.replace(secret, REDACTED)
+        return text
+
+    def format(self, record):
+        if record.args:
+            record.args = _redact(record.args)
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': self._scrub(record.getMessage())
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = _redact(value)
+        if record.exc_info:
+            entry['exc'] = self._scrub(self.formatException(record.exc_info))
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of records below WARNING for configured loggers.
+    `rates` maps a logger name (or dotted prefix) to a rate in [0, 1].
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = dict(rates or {})
+        self._cache = {}
+
+    def _rate(self, name):
+        rate = self._cache.get(name)
+        if rate is None:
+            rate = 1.0
+            prefix = name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition('.')[0]
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+def _native(module, name):
+    """
+    Return `module.name` as it was before gevent monkey patching, so the log
+    listener runs on a real OS thread even inside gevent workers
+    """
+    try:
+        from gevent import monkey
+    except ImportError:
+        return getattr(importlib.import_module(module), name)
+    return monkey.get_original(module, name)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hand records to the listener thread without formatting them and without
+    ever waiting: when the queue is full the record is dropped and counted.
+    """
+
+    def __init__(self, log_queue, max_size):
+        super().__init__(log_queue)
+        self.max_size = max_size
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The queue never leaves the process, so skip the eager formatting
+        # and pickling preparation done by QueueHandler
+        return record
+
+    def enqueue(self, record):
+        if self.queue.qsize() >= self.max_size:
+            self.dropped += 1
+            return
+        self.queue.put_nowait(record)
+
+
+class NativeQueueListener(QueueListener):
+    """
+    QueueListener whose thread is always a real OS thread. Under gevent
+    threading.Thread starts greenlets, and a blocking write to stdout from
+    one would stall every request of the worker.
+    """
+
+    def start(self):
+        self._done = _native('_thread', 'allocate_lock')()
+        self._done.acquire()
+        _native('_thread', 'start_new_thread')(self._run, ())
+
+    def _run(self):
+        try:
+            self._monitor()
+        finally:
+            self._done.release()
+
+    def stop(self):
+        self.enqueue_sentinel()
+        self._done.acquire(timeout=5)
+
+
+queue_handler = None
+_listener = None
+
+
+def configure_logging(app):
+    """Route all logging through a bounded queue drained by a background thread"""
+    global queue_handler, _listener
+    if _listener is not None:
+        return
+
+    config = app.config
+    # The unpatched C SimpleQueue never blocks on put and wakes the OS thread
+    # blocked in get, whether the producer is a thread or a greenlet
+    log_queue = _native('queue', 'SimpleQueue')()
+
+    output = logging.StreamHandler(sys.stdout)
+    # Only ever taken by the listener thread
+    output.lock = _native('threading', 'RLock')()
+    output.setFormatter(RedactingJSONFormatter(secrets=[
+        config.get('RAZORPAY_KEY_SECRET'),
+        config.get('RAZORPAY_WEBHOOK_SECRET'),
+        config.get('JWT_SECRET_KEY'),
+        config.get('SECRET_KEY')
+    ]))
+
+    queue_handler = NonBlockingQueueHandler(log_queue, config.get('LOG_QUEUE_SIZE', 10000))
+    queue_handler.addFilter(SamplingFilter(config.get('LOG_SAMPLE_RATES')))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(config.get('LOG_LEVEL', 'INFO'))
+
+    _listener = NativeQueueListener(log_queue, output)
+    _listener.start()
+    atexit.register(_listener.stop)
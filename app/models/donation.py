@@ -1,14 +1,54 @@
 from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+from sqlalchemy.ext.hybrid import hybrid_property
 from app import db
 
+# Stored status codes, the ORM and the API keep using the names
+STATUS_CODES = {
+    'link_created': 1,
+    'payment_completed': 2,
+    'payment_failed': 3
+}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+def to_paise(amount):
+    """Convert a rupee amount to integer paise without float rounding errors"""
+    return int((Decimal(str(amount)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+class StatusCode(db.TypeDecorator):
+    """A donation status name stored as a SMALLINT code"""
+    impl = db.SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return STATUS_CODES[value]
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return STATUS_NAMES[value]
+
 class Donation(db.Model):
     __tablename__ = 'donations'
+    __table_args__ = (
+        # Read paths only ever look at donations that are not soft deleted
+        db.Index('ix_donations_active_creator', 'link_creator_id',
+                 postgresql_where=db.text('deleted_at IS NULL')),
+        # Lets the purge job find soft deleted rows without a table scan
+        db.Index('ix_donations_deleted', 'id',
+                 postgresql_where=db.text('deleted_at IS NOT NULL')),
+        # Donations still waiting for a payment
+        db.Index('ix_donations_pending', 'link_creator_id',
+                 postgresql_where=db.text('status_code = 1 AND deleted_at IS NULL')),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     link_creator_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount_paise = db.Column(db.BigInteger, nullable=False)
     description = db.Column(db.Text, nullable=True)
-    status = db.Column(db.String(20), default='link_created')
+    status = db.Column('status_code', StatusCode(), nullable=False, default='link_created')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Payment Link fields
@@ -25,6 +65,29 @@ class Donation(db.Model):
     payment_date = db.Column(db.DateTime, nullable=True)
     reference_id = db.Column(db.String(100), nullable=True)
     
+    # Soft delete, rows are removed later by `flask donations purge-deleted`
+    deleted_at = db.Column(db.DateTime, nullable=True)
+    
+    @hybrid_property
+    def amount(self):
+        """Amount in rupees, as exposed by the API"""
+        if self.amount_paise is None:
+            return None
+        return self.amount_paise / 100
+
+    @amount.setter
+    def amount(self, value):
+        self.amount_paise = to_paise(value)
+
+    @amount.expression
+    def amount(cls):
+        return cls.amount_paise / 100.0
+    
+    @classmethod
+    def active(cls):
+        """Query donations that have not been deleted"""
+        return cls.query.filter(cls.deleted_at.is_(None))
+    
     def __repr__(self):
         return f'<Donation {self.id} - {self.amount}>'
 
@@ -0,0 +1,233 @@
+import cProfile
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+import click
+import redis
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+try:
+    import greenlet
+except ImportError:  # only installed alongside gevent
+    greenlet = None
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = ('sql', 'redis', 'razorpay')
+
+# cProfile can only profile one request per thread at a time, and under
+# gevent every request of a worker shares the thread, so one at a time
+_profile_lock = threading.Lock()
+
+
+def _follow_greenlet(profile):
+    """
+    cProfile hooks the OS thread and knows nothing about greenlets, so under
+    gevent it would also record every other request that runs while the
+    profiled one waits on I/O. Pause it whenever the profiled request's
+    greenlet is switched out and resume it when it is switched back in.
+    """
+    owner = greenlet.getcurrent()
+    previous = None
+
+    def trace(event, args):
+        if event in ('switch', 'throw'):
+            origin, target = args
+            if origin is owner:
+                profile.profiler.disable()
+            elif target is owner:
+                profile.profiler.enable()
+        if previous is not None:
+            previous(event, args)
+
+    previous = greenlet.settrace(trace)
+    return previous
+
+
+class RequestProfile:
+    """Profiler and per-category wall time of a single request"""
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.timings = dict.fromkeys(CATEGORIES, 0.0)
+        self.counts = dict.fromkeys(CATEGORIES, 0)
+        self.started = time.perf_counter()
+        self.previous_trace = None
+
+    def add(self, category, elapsed):
+        self.timings[category] += elapsed
+        self.counts[category] += 1
+
+
+def _active_profile():
+    if has_request_context():
+        return g.get('_profile')
+    return None
+
+
+@contextmanager
+def timed(category):
+    """Attribute the wall time of the block to `category` if the request is profiled"""
+    profile = _active_profile()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(category, time.perf_counter() - started)
+
+
+def sign_token(secret, expires):
+    """Build a profiling header value valid until the `expires` timestamp"""
+    digest = hmac.new(secret.encode(), str(int(expires)).encode(), hashlib.sha256).hexdigest()
+    return f'{int(expires)}.{digest}'
+
+
+def _valid_token(secret, token):
+    expires, _, _ = token.partition('.')
+    if not secret or not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(sign_token(secret, int(expires)), token)
+
+
+def _should_profile(config):
+    token = request.headers.get(config['PROFILING_HEADER'])
+    if token:
+        return _valid_token(config.get('PROFILING_SECRET'), token)
+    rate = config.get('PROFILING_SAMPLE_RATE', 0)
+    return rate > 0 and random.random() < rate
+
+
+def _route_name():
+    """Name the profiled view like DonationList.post"""
+    view = current_app.view_functions.get(request.endpoint)
+    view_class = getattr(view, 'view_class', None)
+    if view_class is not None:
+        return f'{view_class.__name__}.{request.method.lower()}'
+    return request.endpoint or 'unknown'
+
+
+def _start_profile():
+    config = current_app.config
+    if not _should_profile(config):
+        return
+    if not _profile_lock.acquire(blocking=False):
+        return
+    profile = RequestProfile()
+    g._profile = profile
+    if greenlet is not None:
+        profile.previous_trace = _follow_greenlet(profile)
+    profile.profiler.enable()
+
+
+def _finish_profile(response=None):
+    profile = g.pop('_profile', None)
+    if profile is None:
+        return
+    try:
+        profile.profiler.disable()
+        if greenlet is not None:
+            greenlet.settrace(profile.previous_trace)
+        # Includes time the request spent switched out waiting on I/O
+        wall = time.perf_counter() - profile.started
+
+        route = _route_name()
+        directory = current_app.config['PROFILING_DIR']
+        os.makedirs(directory, exist_ok=True)
+        name = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}_{route}_{uuid.uuid4().hex[:8]}"
+
+        # pstats output: open with snakeviz, or flameprof/gprof2dot for flame graphs
+        profile.profiler.dump_stats(os.path.join(directory, f'{name}.prof'))
+
+        summary = {
+            'route': route,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code if response is not None else None,
+            'wall_ms': round(wall * 1000, 3),
+            'other_ms': round((wall - sum(profile.timings.values())) * 1000, 3)
+        }
+        for category in CATEGORIES:
+            summary[f'{category}_ms'] = round(profile.timings[category] * 1000, 3)
+            summary[f'{category}_calls'] = profile.counts[category]
+        with open(os.path.join(directory, f'{name}.json'), 'w') as f:
+            json.dump(summary, f, indent=2)
+
+        logger.info("Profiled %s in %.1f ms", route, summary['wall_ms'], extra={'profile': name})
+    except Exception as e:
+        logger.error("Error writing request profile: %s", e)
+    finally:
+        _profile_lock.release()
+
+
+def _instrument_sql():
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _active_profile() is not None:
+            conn.info.setdefault('_profile_started', []).append(time.perf_counter())
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        profile = _active_profile()
+        started = conn.info.get('_profile_started')
+        if profile is not None and started:
+            profile.add('sql', time.perf_counter() - started.pop())
+
+
+def _instrument_redis():
+    def wrap(method):
+        def wrapper(*args, **kwargs):
+            with timed('redis'):
+                return method(*args, **kwargs)
+        wrapper.__wrapped__ = method
+        return wrapper
+
+    if not hasattr(redis.Redis.execute_command, '__wrapped__'):
+        redis.Redis.execute_command = wrap(redis.Redis.execute_command)
+        redis.client.Pipeline.execute = wrap(redis.client.Pipeline.execute)
+
+
+def init_profiling(app):
+    """
+    Opt-in per-request profiling, enabled by PROFILING_ENABLED. A request is
+    profiled when sampled at PROFILING_SAMPLE_RATE or when it carries a valid
+    signed PROFILING_HEADER (see `flask profile-token`).
+    """
+    @app.cli.command('profile-token')
+    def profile_token():
+        """Print a profiling header value valid for 15 minutes"""
+        secret = app.config.get('PROFILING_SECRET')
+        if not secret:
+            raise click.ClickException('PROFILING_SECRET is not set')
+        click.echo(f"{app.config['PROFILING_HEADER']}: {sign_token(secret, time.time() + 900)}")
+
+    if not app.config.get('PROFILING_ENABLED'):
+        return
+
+    _instrument_sql()
+    _instrument_redis()
+    app.before_request(_start_profile)
+
+    @app.after_request
+    def finish_profile(response):
+        _finish_profile(response)
+        return response
+
+    @app.teardown_request
+    def abandon_profile(exc):
+        # after_request is skipped when the view raised
+        if g.get('_profile') is not None:
+            _finish_profile()
@@ -0,0 +1,128 @@
+import logging
+import os
+import threading
+import time
+
+from app import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class PubSubListener:
+    """
+    A single Redis pub/sub connection per process, shared by every consumer.
+    Handlers are called on the listener thread and must not block.
+    """
+
+    def __init__(self, client, poll_timeout=1.0, retry_delay=1.0):
+        self.client = client
+        self.poll_timeout = poll_timeout
+        self.retry_delay = retry_delay
+        self._channels = {}
+        self._patterns = {}
+        self._reconnect_callbacks = []
+        self._confirmed = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def subscribe(self, channel, handler):
+        """Call handler(channel, data) for every message on channel"""
+        with self._lock:
+            self._channels.setdefault(channel, []).append(handler)
+            self._confirmed.setdefault(channel, threading.Event())
+        self._ensure_running()
+
+    def psubscribe(self, pattern, handler):
+        """Call handler(channel, data) for every message on channels matching pattern"""
+        with self._lock:
+            self._patterns.setdefault(pattern, []).append(handler)
+            self._confirmed.setdefault(pattern, threading.Event())
+        self._ensure_running()
+
+    def wait_subscribed(self, name, timeout):
+        """
+        Wait until Redis has confirmed the subscription to a channel or
+        pattern, after which no message published to it is missed.
+        Returns False if it was not confirmed within timeout seconds.
+        """
+        with self._lock:
+            confirmed = self._confirmed.get(name)
+        return confirmed is not None and confirmed.wait(timeout)
+
+    def on_reconnect(self, callback):
+        """
+        Call callback() every time the subscription is (re)established, so
+        consumers can resync state for messages missed while disconnected
+        """
+        with self._lock:
+            self._reconnect_callbacks.append(callback)
+
+    def _ensure_running(self):
+        # Started lazily and per pid, so forked workers get their own thread
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='redis-pubsub', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            pubsub = self.client.pubsub()
+            try:
+                with self._lock:
+                    channels = list(self._channels)
+                    patterns = list(self._patterns)
+                    callbacks = list(self._reconnect_callbacks)
+                if channels:
+                    pubsub.subscribe(*channels)
+                if patterns:
+                    pubsub.psubscribe(*patterns)
+                for callback in callbacks:
+                    callback()
+                self._listen(pubsub, set(channels), set(patterns))
+            except Exception as e:
+                logger.error("Redis pub/sub listener error: %s", e)
+                time.sleep(self.retry_delay)
+            finally:
+                pubsub.close()
+
+    def _listen(self, pubsub, channels, patterns):
+        while True:
+            # Pick up subscriptions registered after the listener started
+            with self._lock:
+                new_channels = set(self._channels) - channels
+                new_patterns = set(self._patterns) - patterns
+            if new_channels:
+                pubsub.subscribe(*new_channels)
+                channels |= new_channels
+            if new_patterns:
+                pubsub.psubscribe(*new_patterns)
+                patterns |= new_patterns
+
+            message = pubsub.get_message(timeout=self.poll_timeout)
+            if message is None:
+                continue
+            if message['type'] in ('subscribe', 'psubscribe'):
+                with self._lock:
+                    confirmed = self._confirmed.get(message['channel'])
+                if confirmed is not None:
+                    confirmed.set()
+                continue
+            if message['type'] not in ('message', 'pmessage'):
+                continue
+
+            with self._lock:
+                if message['type'] == 'pmessage':
+                    handlers = list(self._patterns.get(message['pattern'], []))
+                else:
+                    handlers = list(self._channels.get(message['channel'], []))
+            for handler in handlers:
+                try:
+                    handler(message['channel'], message['data'])
+                except Exception as e:
+                    logger.error("Error handling message on %s: %s", message['channel'], e)
+
+
+listener = PubSubListener(redis_client)
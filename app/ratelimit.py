@@ -0,0 +1,89 @@
+import logging
+import math
+from functools import wraps
+
+from flask import current_app, request
+from flask_jwt_extended import get_jwt_identity
+
+from app import redis_client
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {
+    'second': 1,
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400
+}
+
+# Token bucket refilled continuously at capacity/period, evaluated on the
+# Redis clock in a single round trip. Returns {allowed, retry_after_ms}.
+_token_bucket = redis_client.register_script("""
+local capacity = tonumber(ARGV[1])
+local period_ms = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+local rate = capacity / period_ms
+
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry_after = math.ceil((1 - tokens) / rate)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], period_ms)
+return {allowed, retry_after}
+""")
+
+
+def parse_limit(limit):
+    """Parse "<requests>/<period>" into (requests, period in seconds)"""
+    count, _, period = limit.partition('/')
+    return int(count), PERIODS[period.strip()]
+
+
+def _client_key(scope):
+    if scope == 'user':
+        identity = get_jwt_identity()
+        if identity is not None:
+            return f'user:{identity}'
+    return f'ip:{request.remote_addr}'
+
+
+def rate_limit(name, scope='user'):
+    """
+    Limit a view to the RATE_LIMITS[name] quota per user (falling back to
+    the client IP when unauthenticated) or per IP when scope='ip'.
+    Place below @jwt_required() so the identity is known.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            limit = current_app.config.get('RATE_LIMITS', {}).get(name)
+            if not limit:
+                return fn(*args, **kwargs)
+
+            capacity, period = parse_limit(limit)
+            key = f'ratelimit:{name}:{_client_key(scope)}'
+            try:
+                allowed, retry_after_ms = _token_bucket(keys=[key], args=[capacity, period * 1000])
+            except Exception as e:
+                # Fail open, an unavailable limiter must not take the API down
+                logger.error("Rate limiter unavailable for %s: %s", name, e)
+                return fn(*args, **kwargs)
+
+            if not allowed:
+                retry_after = max(1, math.ceil(retry_after_ms / 1000))
+                return {'message': 'Too many requests, please retry later'}, 429, {'Retry-After': str(retry_after)}
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,22 @@
+import os
+
+bind = '0.0.0.0:6060'
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+
+# Cooperative workers: an idle Server-Sent Events connection is a parked
+# greenlet, not a blocked OS thread
+worker_class = 'gevent'
+worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 1000))
+
+# With gevent workers the timeout only watches the worker heartbeat, which a
+# separate greenlet keeps up while streams are open, so long-lived Server-Sent
+# Events connections are unaffected. A worker whose event loop is blocked for
+# longer than this is killed and replaced.
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+
+
+def post_fork(server, worker):
+    # Let psycopg2 yield to other greenlets while waiting on Postgres
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
@@ -0,0 +1,40 @@
+"""add donation soft delete
+
+Revision ID: 3f1c2a7d9b4e
+Revises: 921549f59624
+Create Date: 2026-10-19 10:12:44.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a7d9b4e'
+down_revision = '921549f59624'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # A nullable column without default is a catalog-only change
+    with op.batch_alter_table('donations', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('deleted_at', sa.DateTime(), nullable=True))
+
+    # Build the partial indexes without blocking writes
+    with op.get_context().autocommit_block():
+        op.create_index('ix_donations_active_creator', 'donations', ['link_creator_id'],
+                        unique=False, postgresql_where=sa.text('deleted_at IS NULL'),
+                        postgresql_concurrently=True)
+        op.create_index('ix_donations_deleted', 'donations', ['id'],
+                        unique=False, postgresql_where=sa.text('deleted_at IS NOT NULL'),
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_donations_deleted', table_name='donations', postgresql_concurrently=True)
+        op.drop_index('ix_donations_active_creator', table_name='donations', postgresql_concurrently=True)
+
+    with op.batch_alter_table('donations', schema=None) as batch_op:
+        batch_op.drop_column('deleted_at')
@@ -0,0 +1,136 @@
+"""drop float amount and string status
+
+Revision ID: 4d8a1f6e2c90
+Revises: 7b2e9d4c1a63
+Create Date: 2026-10-19 11:09:51.227036
+
+Contract step: once the backfill is done, make the compact columns
+authoritative and remove the old ones. Run it only after every running
+instance uses amount_paise/status_code (see 7b2e9d4c1a63), code still
+reading the old columns breaks once they are dropped.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d8a1f6e2c90'
+down_revision = '7b2e9d4c1a63'
+branch_labels = None
+depends_on = None
+
+# Same sync trigger as 7b2e9d4c1a63, recreated on downgrade
+SYNC_FUNCTION_SQL = """
+    CREATE OR REPLACE FUNCTION donations_sync_compact() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.amount IS NOT NULL
+           AND (TG_OP = 'INSERT' OR NEW.amount IS DISTINCT FROM OLD.amount) THEN
+            NEW.amount_paise := ROUND(NEW.amount::numeric * 100)::bigint;
+        ELSIF NEW.amount_paise IS NOT NULL
+           AND (TG_OP = 'INSERT' OR NEW.amount_paise IS DISTINCT FROM OLD.amount_paise) THEN
+            NEW.amount := NEW.amount_paise / 100.0;
+        END IF;
+
+        IF NEW.status IS NOT NULL
+           AND (TG_OP = 'INSERT' OR NEW.status IS DISTINCT FROM OLD.status) THEN
+            NEW.status_code := CASE NEW.status
+                WHEN 'link_created' THEN 1
+                WHEN 'payment_completed' THEN 2
+                WHEN 'payment_failed' THEN 3
+                ELSE 1
+            END;
+        ELSIF NEW.status_code IS NOT NULL
+           AND (TG_OP = 'INSERT' OR NEW.status_code IS DISTINCT FROM OLD.status_code) THEN
+            NEW.status := CASE NEW.status_code
+                WHEN 1 THEN 'link_created'
+                WHEN 2 THEN 'payment_completed'
+                WHEN 3 THEN 'payment_failed'
+            END;
+        END IF;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+"""
+SYNC_TRIGGER_SQL = """
+    CREATE TRIGGER donations_sync_compact
+    BEFORE INSERT OR UPDATE OF amount, status, amount_paise, status_code ON donations
+    FOR EACH ROW EXECUTE FUNCTION donations_sync_compact()
+"""
+
+
+def upgrade():
+    # env.py runs a revision in a single transaction, which would keep the
+    # ACCESS EXCLUSIVE lock of the first ALTER TABLE until the end. Run the
+    # slow steps in autocommit instead, each in its own short transaction.
+    with op.get_context().autocommit_block():
+        # Rows written since the backfill are covered by the trigger;
+        # this only catches anything it could not see. Row locks only.
+        op.execute("""
+            UPDATE donations
+            SET amount_paise = ROUND(amount::numeric * 100)::bigint
+            WHERE amount_paise IS NULL
+        """)
+        op.execute("""
+            UPDATE donations
+            SET status_code = CASE status
+                WHEN 'payment_completed' THEN 2
+                WHEN 'payment_failed' THEN 3
+                ELSE 1
+            END
+            WHERE status_code IS NULL
+        """)
+
+        # NOT VALID only takes the lock briefly, without scanning the table
+        op.execute("ALTER TABLE donations ADD CONSTRAINT donations_amount_paise_not_null "
+                   "CHECK (amount_paise IS NOT NULL) NOT VALID")
+        op.execute("ALTER TABLE donations ADD CONSTRAINT donations_status_code_not_null "
+                   "CHECK (status_code IS NOT NULL) NOT VALID")
+        # VALIDATE scans under SHARE UPDATE EXCLUSIVE, which allows reads and writes
+        op.execute("ALTER TABLE donations VALIDATE CONSTRAINT donations_amount_paise_not_null")
+        op.execute("ALTER TABLE donations VALIDATE CONSTRAINT donations_status_code_not_null")
+
+    # Catalog-only changes: SET NOT NULL skips its table scan because the
+    # validated CHECK constraints already prove it
+    op.execute("DROP TRIGGER IF EXISTS donations_sync_compact ON donations")
+    op.execute("DROP FUNCTION IF EXISTS donations_sync_compact()")
+
+    with op.batch_alter_table('donations', schema=None) as batch_op:
+        batch_op.alter_column('amount_paise', existing_type=sa.BigInteger(), nullable=False)
+        batch_op.alter_column('status_code', existing_type=sa.SmallInteger(), nullable=False,
+                              server_default=sa.text('1'))
+        batch_op.drop_constraint('donations_amount_paise_not_null', type_='check')
+        batch_op.drop_constraint('donations_status_code_not_null', type_='check')
+        batch_op.drop_column('status')
+        batch_op.drop_column('amount')
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_donations_pending', 'donations', ['link_creator_id'],
+                        unique=False, postgresql_where=sa.text('status_code = 1 AND deleted_at IS NULL'),
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_donations_pending', table_name='donations', postgresql_concurrently=True)
+
+    with op.batch_alter_table('donations', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('amount', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('status', sa.String(length=20), nullable=True))
+
+    op.execute("UPDATE donations SET amount = amount_paise / 100.0")
+    op.execute("""
+        UPDATE donations
+        SET status = CASE status_code
+            WHEN 1 THEN 'link_created'
+            WHEN 2 THEN 'payment_completed'
+            WHEN 3 THEN 'payment_failed'
+        END
+    """)
+
+    with op.batch_alter_table('donations', schema=None) as batch_op:
+        batch_op.alter_column('status_code', existing_type=sa.SmallInteger(), server_default=None)
+
+    # Back to the expand schema, where both sets of columns are kept in sync
+    op.execute(SYNC_FUNCTION_SQL)
+    op.execute(SYNC_TRIGGER_SQL)
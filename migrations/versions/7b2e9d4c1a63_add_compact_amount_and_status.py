@@ -0,0 +1,115 @@
+"""add integer paise amount and smallint status, backfilled online
+
+Revision ID: 7b2e9d4c1a63
+Revises: 3f1c2a7d9b4e
+Create Date: 2026-10-19 11:02:17.904512
+
+Expand step of the Float/String -> BIGINT paise/SMALLINT status change.
+A trigger keeps the old and new columns in sync in both directions, so
+code using either set can run against this schema, and existing rows are
+backfilled in small batches, each in its own transaction, so no long
+lock is held on donations. `amount` is made nullable because the new
+code no longer writes it.
+
+Deploy order:
+1. flask db upgrade 7b2e9d4c1a63
+2. roll out the code using amount_paise/status_code
+3. once no old code is running, run the contract step 4d8a1f6e2c90
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b2e9d4c1a63'
+down_revision = '3f1c2a7d9b4e'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+
+# Unknown statuses fall back to link_created, the status endpoint
+# re-derives them from Razorpay on the next refresh
+AMOUNT_PAISE_SQL = "ROUND(amount::numeric * 100)::bigint"
+STATUS_CODE_SQL = """CASE status
+    WHEN 'link_created' THEN 1
+    WHEN 'payment_completed' THEN 2
+    WHEN 'payment_failed' THEN 3
+    ELSE 1
+END"""
+
+# Whichever side a write changed is copied to the other one: the old
+# columns for code that predates this change, the new ones for code after it
+SYNC_FUNCTION_SQL = """
+    CREATE OR REPLACE FUNCTION donations_sync_compact() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.amount IS NOT NULL
+           AND (TG_OP = 'INSERT' OR NEW.amount IS DISTINCT FROM OLD.amount) THEN
+            NEW.amount_paise := ROUND(NEW.amount::numeric * 100)::bigint;
+        ELSIF NEW.amount_paise IS NOT NULL
+           AND (TG_OP = 'INSERT' OR NEW.amount_paise IS DISTINCT FROM OLD.amount_paise) THEN
+            NEW.amount := NEW.amount_paise / 100.0;
+        END IF;
+
+        IF NEW.status IS NOT NULL
+           AND (TG_OP = 'INSERT' OR NEW.status IS DISTINCT FROM OLD.status) THEN
+            NEW.status_code := CASE NEW.status
+                WHEN 'link_created' THEN 1
+                WHEN 'payment_completed' THEN 2
+                WHEN 'payment_failed' THEN 3
+                ELSE 1
+            END;
+        ELSIF NEW.status_code IS NOT NULL
+           AND (TG_OP = 'INSERT' OR NEW.status_code IS DISTINCT FROM OLD.status_code) THEN
+            NEW.status := CASE NEW.status_code
+                WHEN 1 THEN 'link_created'
+                WHEN 2 THEN 'payment_completed'
+                WHEN 3 THEN 'payment_failed'
+            END;
+        END IF;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+"""
+SYNC_TRIGGER_SQL = """
+    CREATE TRIGGER donations_sync_compact
+    BEFORE INSERT OR UPDATE OF amount, status, amount_paise, status_code ON donations
+    FOR EACH ROW EXECUTE FUNCTION donations_sync_compact()
+"""
+
+
+def upgrade():
+    with op.batch_alter_table('donations', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('amount_paise', sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column('status_code', sa.SmallInteger(), nullable=True))
+        batch_op.alter_column('amount', existing_type=sa.Float(), nullable=True)
+
+    op.execute(SYNC_FUNCTION_SQL)
+    op.execute(SYNC_TRIGGER_SQL)
+
+    # The trigger copies the backfilled values back to the old columns,
+    # which also rounds amount to whole paise
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        max_id = bind.execute(sa.text("SELECT COALESCE(MAX(id), 0) FROM donations")).scalar()
+        for start in range(0, max_id, BATCH_SIZE):
+            bind.execute(sa.text(f"""
+                UPDATE donations
+                SET amount_paise = {AMOUNT_PAISE_SQL},
+                    status_code = {STATUS_CODE_SQL}
+                WHERE id > :start AND id <= :end
+                  AND (amount_paise IS NULL OR status_code IS NULL)
+            """), {'start': start, 'end': start + BATCH_SIZE})
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS donations_sync_compact ON donations")
+    op.execute("DROP FUNCTION IF EXISTS donations_sync_compact()")
+
+    op.execute("UPDATE donations SET amount = amount_paise / 100.0 WHERE amount IS NULL")
+
+    with op.batch_alter_table('donations', schema=None) as batch_op:
+        batch_op.alter_column('amount', existing_type=sa.Float(), nullable=False)
+        batch_op.drop_column('status_code')
+        batch_op.drop_column('amount_paise')